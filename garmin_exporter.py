@@ -8,14 +8,17 @@ heavy lifting (install with ``pip install garminconnect``).
 from __future__ import annotations
 
 import argparse
-import io
 import json
 import os
+import random
 import sys
-import zipfile
-from getpass import getpass
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, List, Sequence, Set
+from typing import BinaryIO, Dict, Iterator, List, Sequence, Set
 
 Garmin: object | None = None
 GARMINCONNECT_IMPORT_ERROR: Exception | None = None
@@ -40,6 +43,30 @@ try:
 except ImportError:  # pragma: no cover
     ActivityDownloadFormat = None
 
+try:
+    import httpx  # type: ignore
+except ImportError:  # pragma: no cover - optional HTTP/2 download transport
+    httpx = None
+
+# Garmin's "original" download: the FIT file as recorded, usually zip-wrapped.
+FIT_DOWNLOAD_PATH = "/download-service/files/activity/{activity_id}"
+COPY_CHUNK_SIZE = 1024 * 1024
+# FIT files carry ".FIT" at bytes 8-11 of their (12 or 14 byte) header.
+FIT_HEADER_SIZE = 12
+ACTIVITY_CACHE_VERSION = 2
+# Pages fetched past the first cached activity to catch backdated uploads.
+CACHE_RECHECK_PAGES = 2
+
+# Serialises progress output from the download worker threads.
+_PRINT_LOCK = threading.Lock()
+# Keeps worker threads from refreshing the OAuth token concurrently.
+_AUTH_LOCK = threading.Lock()
+
+
+def log(*args, **kwargs) -> None:
+    with _PRINT_LOCK:
+        print(*args, **kwargs)
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -75,33 +102,156 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Skip downloads when the destination FIT file already exists.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of activities downloaded in parallel.",
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=0,
+        help="Unpack zip-wrapped downloads on this many worker processes "
+        "(0 unpacks them on the download threads).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Fetch the full activity list instead of using the cached one "
+        "in $XDG_CACHE_HOME/garmin-exporter. Needed to pick up activities "
+        "uploaded with an older start date.",
+    )
     return parser.parse_args()
 
 
 def resolve_credentials(args: argparse.Namespace) -> tuple[str, str]:
     username = args.username or os.getenv("GARMIN_USERNAME") or input("Garmin username: ")
-    password = args.password or os.getenv("GARMIN_PASSWORD") or getpass("Garmin password: ")
+    password = args.password or os.getenv("GARMIN_PASSWORD")
+    if not password:
+        from getpass import getpass
+
+        password = getpass("Garmin password: ")
     return username.strip(), password.strip()
 
 
-def fetch_all_activities(
+def default_cache_path(username: str) -> Path:
+    cache_home = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "garmin-exporter" / f"activities-{sanitize_name(username)}.json"
+
+
+@dataclass(slots=True, frozen=True)
+class ActivityMeta:
+    """The few fields of a Garmin activity the exporter actually uses."""
+
+    id: int | None
+    type_key: str | None
+    name: str | None
+
+
+def activity_type_key(activity: dict, _get=dict.get) -> str | None:
+    # ``dict.get`` is bound as a default so the lookup stays local per call.
+    activity_type = _get(activity, "activityType")
+    return _get(activity_type, "typeKey") if activity_type else None
+
+
+def compact_activity(activity: dict) -> ActivityMeta:
+    """Reduce a Garmin activity dict to the fields the exporter uses."""
+    return ActivityMeta(activity.get("activityId"), activity_type_key(activity), activity.get("activityName"))
+
+
+def load_activity_cache(cache_path: Path) -> List[ActivityMeta]:
+    """Return the cached activities, or an empty list if none are usable."""
+    try:
+        data = json.loads(cache_path.read_text())
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as exc:
+        print(f"Ignoring unreadable activity cache {cache_path}: {exc}", file=sys.stderr)
+        return []
+    if not isinstance(data, dict) or data.get("version") != ACTIVITY_CACHE_VERSION:
+        return []
+    try:
+        return [ActivityMeta(*record) for record in data.get("activities") or []]
+    except TypeError as exc:
+        print(f"Ignoring unreadable activity cache {cache_path}: {exc}", file=sys.stderr)
+        return []
+
+
+def save_activity_cache(cache_path: Path, activities: List[ActivityMeta]) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    records = [(activity.id, activity.type_key, activity.name) for activity in activities]
+    tmp_path.write_text(json.dumps({"version": ACTIVITY_CACHE_VERSION, "activities": records}))
+    os.replace(tmp_path, cache_path)
+
+
+def _iter_activity_pages(
     client: "Garmin",
     batch_size: int,
-    max_activities: int | None = None,
-) -> List[dict]:
-    activities: List[dict] = []
+    cache_path: Path | None,
+) -> Iterator[ActivityMeta]:
+    cached = load_activity_cache(cache_path) if cache_path is not None else []
+    cached_index = {activity.id: index for index, activity in enumerate(cached) if activity.id is not None}
+
+    fetched: List[ActivityMeta] = []
+    fetched_ids = set()
     start = 0
+    oldest_cached: int | None = None  # index in ``cached`` of the oldest one seen
+    pages_past_cache = 0
+    reached_end = False
     while True:
         chunk = client.get_activities(start, batch_size)
         if not chunk:
+            reached_end = True
             break
-        activities.extend(chunk)
+        for activity in chunk:
+            meta = compact_activity(activity)
+            index = cached_index.get(meta.id)
+            if index is not None and (oldest_cached is None or index > oldest_cached):
+                oldest_cached = index
+            fetched.append(meta)
+            fetched_ids.add(meta.id)
+            yield meta
         start += batch_size
-        if max_activities and len(activities) >= max_activities:
-            activities = activities[:max_activities]
-            break
-        print(f"Fetched {len(activities)} activities so far...", file=sys.stderr)
-    return activities
+        print(f"Fetched {len(fetched)} activities so far...", file=sys.stderr)
+        # Keep paging a little past the first cached activity so late syncs
+        # and uploads dated just before it are still picked up.
+        if oldest_cached is not None:
+            if pages_past_cache >= CACHE_RECHECK_PAGES:
+                break
+            pages_past_cache += 1
+
+    tail: List[ActivityMeta] = []
+    if not reached_end and oldest_cached is not None:
+        tail = [activity for activity in cached[oldest_cached + 1:] if activity.id not in fetched_ids]
+    if cache_path is not None:
+        try:
+            save_activity_cache(cache_path, fetched + tail)
+        except OSError as exc:
+            print(f"Unable to update activity cache {cache_path}: {exc}", file=sys.stderr)
+    if tail:
+        print(f"Using {len(tail)} cached activities.", file=sys.stderr)
+        yield from tail
+
+
+def iter_activities(
+    client: "Garmin",
+    batch_size: int,
+    max_activities: int | None = None,
+    cache_path: Path | None = None,
+) -> Iterator[ActivityMeta]:
+    """Yield ``ActivityMeta`` entries, newest first, one page at a time.
+
+    Full activity dicts are dropped as soon as their page has been reduced.
+    With ``cache_path`` set, paging stops ``CACHE_RECHECK_PAGES`` pages after
+    the first activity that is already cached, and the older cached history
+    follows. Activities uploaded with a start time further back than that are
+    only found with the cache disabled. The cache is only written once the
+    history is complete, so a run cut short by ``max_activities`` never leaves
+    a cache with gaps in it.
+    """
+    return islice(_iter_activity_pages(client, batch_size, cache_path), max_activities or None)
 
 
 def prompt_activity_types(activity_types: Sequence[str]) -> Set[str]:
@@ -134,16 +284,34 @@ def prompt_activity_types(activity_types: Sequence[str]) -> Set[str]:
         return {activity_types[index - 1] for index in indexes}
 
 
+class _SanitizeTable(dict):
+    """``str.translate`` table mapping alphanumerics to lowercase, others to '-'.
+
+    Entries are filled in lazily so non-ASCII names keep the ``str.isalnum``
+    semantics without precomputing the whole Unicode range.
+    """
+
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        value = char.lower() if char.isalnum() else "-"
+        self[codepoint] = value
+        return value
+
+
+_SANITIZE_TABLE = _SanitizeTable()
+
+
 def sanitize_name(name: str) -> str:
-    cleaned = [
-        char.lower() if char.isalnum() else "-"
-        for char in name.strip().replace(" ", "-")
-    ]
-    return "".join(cleaned).strip("-") or "activity"
+    return name.strip().translate(_SANITIZE_TABLE).strip("-") or "activity"
 
 
 def download_fit_blob(client: "Garmin", activity_id: int) -> bytes:
-    """Request the FIT blob for an activity via garminconnect."""
+    """Request the FIT blob for an activity via garminconnect.
+
+    The ``bytes`` garminconnect returns are handed on untouched; pass them
+    straight to a file write rather than slicing or converting to
+    ``bytearray``, either of which copies the whole payload.
+    """
     errors: list[str] = []
 
     def attempt(label: str, func):
@@ -208,41 +376,248 @@ def download_fit_blob(client: "Garmin", activity_id: int) -> bytes:
     )
 
 
-def extract_fit_bytes(payload: bytes) -> bytes:
-    """Extract the FIT payload from a Garmin download response."""
-    if payload.startswith(b"PK"):
-        with zipfile.ZipFile(io.BytesIO(payload)) as archive:
-            for name in archive.namelist():
-                if name.lower().endswith(".fit"):
-                    return archive.read(name)
-            raise RuntimeError("Downloaded zip file does not contain a FIT payload.")
-    return payload
+def open_http2_client(client: "Garmin") -> "httpx.Client | None":
+    """Return an HTTP/2 client for activity downloads, if one can be built.
+
+    Requires ``httpx`` with its ``http2`` extra and a garth-based garminconnect
+    release; otherwise downloads keep using garth's HTTP/1.1 session.
+    """
+    garth = getattr(client, "garth", None)
+    if httpx is None or garth is None or not hasattr(garth, "oauth2_token"):
+        return None
+
+    headers = {}
+    user_agent = getattr(getattr(garth, "sess", None), "headers", {}).get("User-Agent")
+    if user_agent:
+        headers["User-Agent"] = user_agent
+    try:
+        return httpx.Client(
+            http2=True,
+            base_url=f"https://connectapi.{getattr(garth, 'domain', 'garmin.com')}",
+            headers=headers,
+            timeout=httpx.Timeout(30.0),
+        )
+    except ImportError:  # httpx is installed without the 'h2' package
+        return None
+
+
+def _refresh_token_if_expired(garth) -> None:
+    # garth refreshes expired tokens inside every API call; doing it here under
+    # a lock keeps concurrent download threads from all refreshing at once.
+    with _AUTH_LOCK:
+        token = getattr(garth, "oauth2_token", None)
+        if token is not None and getattr(token, "expired", False):
+            garth.refresh_oauth2()
 
 
-def write_fit_file(destination: Path, payload: bytes) -> None:
-    destination.write_bytes(extract_fit_bytes(payload))
-    print(f"Wrote {destination}")
+def _authorization_header(garth) -> str:
+    _refresh_token_if_expired(garth)
+    return str(garth.oauth2_token)
 
 
-def build_destination_path(activity: dict, output_dir: Path) -> Path:
-    activity_id = activity.get("activityId", "unknown")
-    name = sanitize_name(activity.get("activityName", f"activity-{activity_id}"))
+def iter_fit_chunks(
+    client: "Garmin",
+    activity_id: int,
+    http: "httpx.Client | None" = None,
+) -> Iterator[bytes]:
+    """Yield the raw download response for an activity in chunks.
+
+    Downloads are multiplexed over ``http`` when given, otherwise streamed from
+    garminconnect's garth session; older releases without one fall back to
+    ``download_fit_blob``.
+    """
+    path = FIT_DOWNLOAD_PATH.format(activity_id=activity_id)
+    garth = getattr(client, "garth", None)
+    if http is not None:
+        headers = {"Authorization": _authorization_header(garth)}
+        with http.stream("GET", path, headers=headers) as response:
+            response.raise_for_status()
+            yield from response.iter_bytes(chunk_size=COPY_CHUNK_SIZE)
+        return
+
+    if garth is None or not hasattr(garth, "request"):
+        yield download_fit_blob(client, activity_id)
+        return
+
+    _refresh_token_if_expired(garth)
+    response = garth.request("GET", "connectapi", path, api=True, stream=True)
+    with response:
+        yield from response.iter_content(chunk_size=COPY_CHUNK_SIZE)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """``os.write`` all of ``data``, bypassing Python's buffered file layer."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _create_temp_file(destination: Path, suffix: str) -> tuple[int, Path]:
+    """Create a uniquely named file next to ``destination`` for later renaming.
+
+    Unlike ``mkstemp``, which always uses 0600, the file gets the regular
+    umask-derived permissions so it can be renamed into place as-is.
+    """
+    flags = os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        path = destination.with_name(f".{destination.name}.{os.urandom(4).hex()}{suffix}")
+        try:
+            return os.open(path, flags, 0o666), path
+        except FileExistsError:
+            continue
+
+
+def extract_fit_member(archive_file: Path | BinaryIO, destination: Path) -> None:
+    """Copy the first FIT member of a zip archive to ``destination``.
+
+    The central directory is read once by ``ZipFile`` and the member is opened
+    by its ``ZipInfo``, so no second name lookup is needed. The member is
+    unpacked into a temporary file that only replaces ``destination`` once it
+    has been read in full and passed its CRC check. Takes a path when run on
+    an extraction process pool.
+    """
+    import zipfile
+
+    with zipfile.ZipFile(archive_file) as archive:
+        for info in archive.infolist():
+            if info.filename.lower().endswith(".fit"):
+                # zipfile only verifies the CRC once the member is fully read,
+                # so unpack next to the destination and rename on success.
+                with archive.open(info) as source:
+                    fd, tmp_path = _create_temp_file(destination, ".unzip")
+                    try:
+                        try:
+                            while chunk := source.read(COPY_CHUNK_SIZE):
+                                _write_all(fd, chunk)
+                        finally:
+                            os.close(fd)
+                        os.replace(tmp_path, destination)
+                    finally:
+                        tmp_path.unlink(missing_ok=True)
+                return
+    raise RuntimeError("Downloaded zip file does not contain a FIT payload.")
+
+
+def write_fit_file(
+    client: "Garmin",
+    activity_id: int,
+    destination: Path,
+    http: "httpx.Client | None" = None,
+    extractor: Executor | None = None,
+) -> None:
+    """Download an activity to ``destination`` without buffering it in memory.
+
+    The response is spooled to a temporary file next to ``destination``, then
+    either renamed into place when it carries a FIT header or, for zip-wrapped
+    downloads, unpacked from it, on ``extractor`` when one is given.
+    """
+    fd, tmp_path = _create_temp_file(destination, ".part")
+    try:
+        try:
+            for chunk in iter_fit_chunks(client, activity_id, http):
+                _write_all(fd, chunk)
+            os.lseek(fd, 0, os.SEEK_SET)
+            header = os.read(fd, FIT_HEADER_SIZE)
+            is_fit = header[8:12] == b".FIT"
+            if not is_fit:
+                if not header.startswith(b"PK"):
+                    raise RuntimeError("Downloaded payload is neither a FIT file nor a zip archive.")
+                if extractor is not None:
+                    extractor.submit(extract_fit_member, tmp_path, destination).result()
+                else:
+                    with open(fd, "rb", closefd=False) as archive_file:
+                        extract_fit_member(archive_file, destination)
+        finally:
+            os.close(fd)
+        if is_fit:
+            os.replace(tmp_path, destination)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def build_destination_path(activity_id: int, activity_name: str | None, output_dir: Path) -> Path:
+    name = sanitize_name(activity_name if activity_name is not None else f"activity-{activity_id}")
     return output_dir / f"{activity_id}_{name}.fit"
 
 
-def filter_activities_by_type(
-    activities: Iterable[dict],
-    wanted_types: Set[str] | None,
-) -> List[dict]:
-    if not wanted_types:
-        return list(activities)
+def _is_rate_limited(exc: BaseException) -> bool:
+    if GarminConnectTooManyRequestsError is not Exception and isinstance(exc, GarminConnectTooManyRequestsError):
+        return True
+    # garth wraps the requests error in ``.error``; httpx exposes ``.response``.
+    for error in (exc, getattr(exc, "error", None)):
+        if getattr(getattr(error, "response", None), "status_code", None) == 429:
+            return True
+    return False
 
-    filtered: List[dict] = []
+
+def _with_retry(fn, *args, tries: int = 5, base: float = 2.0):
+    """Call ``fn`` and back off exponentially while Garmin answers with 429."""
+    for attempt in range(tries):
+        try:
+            return fn(*args)
+        except Exception as exc:
+            if attempt == tries - 1 or not _is_rate_limited(exc):
+                raise
+            delay = base * 2**attempt + random.random()
+            log(f"Rate limited by Garmin Connect; retrying in {delay:.1f}s...", file=sys.stderr)
+            time.sleep(delay)
+
+
+def download_activities(
+    client: "Garmin",
+    activities: Sequence[ActivityMeta],
+    output_dir: Path,
+    skip_existing: bool,
+    workers: int,
+    http: "httpx.Client | None" = None,
+    extract_workers: int = 0,
+) -> int:
+    """Download activities on a thread pool and return the number of failures."""
+    pending: List[tuple[int, Path]] = []
     for activity in activities:
-        type_key = (activity.get("activityType") or {}).get("typeKey")
-        if type_key in wanted_types:
-            filtered.append(activity)
-    return filtered
+        if activity.id is None:
+            print(f"Skipping activity without an ID: {activity.name!r}", file=sys.stderr)
+            continue
+        pending.append((activity.id, build_destination_path(activity.id, activity.name, output_dir)))
+
+    if skip_existing:
+        # One directory scan up front instead of a stat() per activity.
+        with os.scandir(output_dir) as entries:
+            existing = {entry.name for entry in entries if entry.name.endswith(".fit")}
+        skipped = len(pending)
+        pending = [(activity_id, destination) for activity_id, destination in pending if destination.name not in existing]
+        skipped -= len(pending)
+        if skipped:
+            print(f"Skipping {skipped} activities already present in {output_dir}")
+
+    total = len(pending)
+
+    def _fetch_and_write(job: tuple[int, tuple[int, Path]]) -> bool:
+        index, (activity_id, destination) = job
+        try:
+            _with_retry(write_fit_file, client, activity_id, destination, http, extractor)
+        except Exception as exc:
+            log(f"[{index}/{total}] Failed to download activity {activity_id}: {exc}", file=sys.stderr)
+            return False
+        log(f"[{index}/{total}] Wrote {destination}")
+        return True
+
+    extractor = None
+    if extract_workers > 0:
+        # Workers start lazily from a download thread; never fork() this
+        # multi-threaded process, which can deadlock the child on held locks.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        extractor = ProcessPoolExecutor(max_workers=extract_workers, mp_context=multiprocessing.get_context(method))
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(_fetch_and_write, enumerate(pending, start=1)))
+    finally:
+        if extractor is not None:
+            extractor.shutdown()
+    return results.count(False)
 
 
 def export_activities(args: argparse.Namespace) -> None:
@@ -267,19 +642,30 @@ def export_activities(args: argparse.Namespace) -> None:
         print("Unable to connect to Garmin Connect right now.", file=sys.stderr)
         raise SystemExit(str(exc))
 
-    activities = fetch_all_activities(client, args.batch_size, args.max_activities)
+    cache_path = None if args.no_cache else default_cache_path(username)
+    # Stream the activity list once, grouping by type as entries arrive; the
+    # groups double as the type filter.
+    activities: List[ActivityMeta] = []
+    by_type: Dict[str, List[ActivityMeta]] = {}
+    for activity in iter_activities(client, args.batch_size, args.max_activities, cache_path):
+        activities.append(activity)
+        if activity.type_key:
+            by_type.setdefault(activity.type_key, []).append(activity)
     if not activities:
         print("No activities returned by Garmin Connect.")
         return
-
-    type_keys = sorted({
-        (activity.get("activityType") or {}).get("typeKey")
-        for activity in activities
-        if activity.get("activityType")
-    })
+    type_keys = sorted(by_type)
 
     selected_types = prompt_activity_types(type_keys)
-    filtered = filter_activities_by_type(activities, selected_types)
+    if selected_types:
+        filtered = [
+            activity
+            for type_key in type_keys
+            if type_key in selected_types
+            for activity in by_type[type_key]
+        ]
+    else:
+        filtered = activities
     if not filtered:
         print("No activities matched the selected type filters.")
         return
@@ -287,19 +673,23 @@ def export_activities(args: argparse.Namespace) -> None:
     output_dir = Path(args.output).expanduser().resolve()
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    for activity in filtered:
-        destination = build_destination_path(activity, output_dir)
-        if args.skip_existing and destination.exists():
-            print(f"Skipping existing file {destination}")
-            continue
-
-        activity_id = activity.get("activityId")
-        if activity_id is None:
-            print(f"Skipping activity without an ID: {json.dumps(activity, default=str)[:80]}...", file=sys.stderr)
-            continue
-
-        payload = download_fit_blob(client, activity_id)
-        write_fit_file(destination, payload)
+    http = open_http2_client(client)
+    try:
+        failures = download_activities(
+            client,
+            filtered,
+            output_dir,
+            args.skip_existing,
+            args.workers,
+            http,
+            args.extract_workers,
+        )
+    finally:
+        if http is not None:
+            http.close()
+    if failures:
+        print(f"\n{failures} of {len(filtered)} downloads failed.", file=sys.stderr)
+        raise SystemExit(1)
 
     print(f"\nExported {len(filtered)} activities to {output_dir}")
 